@@ -1,10 +1,36 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import yt_dlp
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request as YtdlpRequest
+from yt_dlp.networking.exceptions import HTTPError as YtdlpHTTPError, TransportError
+from yt_dlp.utils import (
+    ContentTooShortError, DownloadError, ExtractorError, GeoRestrictedError, LazyList, UnsupportedError,
+    determine_protocol
+)
 import os
+import re
+import sys
+import subprocess
+import copy
+import json
+import base64
+import io
+import zipfile
+import fcntl
+import contextlib
+import cProfile
+import functools
+import hmac
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import shutil
+import hashlib
 import uuid
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from urllib.parse import quote, urlencode, urlsplit
 import time
 
 app = Flask(__name__)
@@ -15,8 +41,22 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create temp directory
-TEMP_DIR = Path("/tmp/downloads")
-TEMP_DIR.mkdir(exist_ok=True)
+TEMP_DIR = Path(os.environ.get('TEMP_DIR', '/tmp/downloads'))
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
+# Temp file cleanup
+TEMP_MAX_AGE = float(os.environ.get('TEMP_MAX_AGE', 3600))
+TEMP_MAX_BYTES = int(os.environ.get('TEMP_MAX_BYTES', 2 * 1024 ** 3))
+JANITOR_INTERVAL = float(os.environ.get('JANITOR_INTERVAL', 300))
+# Served files linger briefly so requests sharing the same download can still open them
+SERVED_FILE_GRACE = float(os.environ.get('SERVED_FILE_GRACE', 30))
+# Files written to this recently belong to a download that is still running
+ACTIVE_FILE_WINDOW = 120
+
+# yt-dlp's on-disk cache of signature and n-parameter solutions, shared by all workers
+YTDLP_CACHE_DIR = os.environ.get('YTDLP_CACHE_DIR', '/tmp/yt-dlp-cache')
+# Player versions kept in that cache, older ones are removed when a new player shows up
+YTDLP_CACHE_PLAYERS = int(os.environ.get('YTDLP_CACHE_PLAYERS', 3))
 
 # Custom yt-dlp options to avoid 403 errors
 CUSTOM_YTDLP_OPTS = {
@@ -37,18 +77,963 @@ CUSTOM_YTDLP_OPTS = {
     'retries': 10,
     'fragment_retries': 10,
     'skip_unavailable_fragments': True,
+    'cachedir': YTDLP_CACHE_DIR,
+}
+
+# Metadata cache settings
+INFO_CACHE_SIZE = int(os.environ.get('INFO_CACHE_SIZE', 512))
+INFO_CACHE_TTL = float(os.environ.get('INFO_CACHE_TTL', 600))
+INFO_CACHE_NEGATIVE_TTL = float(os.environ.get('INFO_CACHE_NEGATIVE_TTL', 30))
+# Full info dicts are large and their format URLs expire, keep fewer for less time
+FULL_INFO_CACHE_SIZE = int(os.environ.get('FULL_INFO_CACHE_SIZE', 64))
+FULL_INFO_CACHE_TTL = float(os.environ.get('FULL_INFO_CACHE_TTL', 300))
+
+# Finished downloads are kept here and served again for identical requests
+DOWNLOAD_CACHE_DIR = Path(os.environ.get('DOWNLOAD_CACHE_DIR', '/tmp/download-cache'))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get('DOWNLOAD_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+DOWNLOAD_LOCK_DIR = DOWNLOAD_CACHE_DIR / 'locks'
+DOWNLOAD_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+
+# Background download jobs
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOBS_DIR = Path(os.environ.get('JOBS_DIR', '/tmp/download-jobs'))
+JOB_PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL', 0.5))
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Batch info lookups
+BATCH_INFO_MAX_URLS = int(os.environ.get('BATCH_INFO_MAX_URLS', 100))
+BATCH_INFO_CONCURRENCY = int(os.environ.get('BATCH_INFO_CONCURRENCY', 8))
+INFO_WORKERS = int(os.environ.get('INFO_WORKERS', 16))
+
+# Playlist pagination
+PLAYLIST_PAGE_SIZE = int(os.environ.get('PLAYLIST_PAGE_SIZE', 50))
+PLAYLIST_MAX_PAGE_SIZE = int(os.environ.get('PLAYLIST_MAX_PAGE_SIZE', 200))
+PLAYLIST_CURSOR_TTL = float(os.environ.get('PLAYLIST_CURSOR_TTL', 600))
+
+# Playlist zip downloads
+PLAYLIST_ZIP_MAX_ENTRIES = int(os.environ.get('PLAYLIST_ZIP_MAX_ENTRIES', 50))
+PLAYLIST_ZIP_CONCURRENCY = int(os.environ.get('PLAYLIST_ZIP_CONCURRENCY', 3))
+
+# Warm YoutubeDL instances
+YTDL_POOL_MAX_IDLE = int(os.environ.get('YTDL_POOL_MAX_IDLE', 4))
+YTDL_POOL_MAX_USES = int(os.environ.get('YTDL_POOL_MAX_USES', 50))
+
+# Worker warm-up, WARMUP_URL is extracted once to fetch and cache the player JS
+WARMUP_URL = os.environ.get('WARMUP_URL', '')
+WARMUP_EXTRACTORS = ('Youtube', 'YoutubeTab', 'Generic')
+
+# Admission control, requests beyond the queue limits get 429
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', 8))
+MAX_CONCURRENT_TRANSCODES = int(os.environ.get('MAX_CONCURRENT_TRANSCODES', os.cpu_count() or 2))
+MAX_INFLIGHT_DOWNLOAD_BYTES = int(os.environ.get('MAX_INFLIGHT_DOWNLOAD_BYTES', 1024 ** 3))
+# Reserved for a download whose size is not known up front
+DEFAULT_DOWNLOAD_BYTES = int(os.environ.get('DEFAULT_DOWNLOAD_BYTES', 64 * 1024 ** 2))
+ADMISSION_QUEUE_LIMIT = int(os.environ.get('ADMISSION_QUEUE_LIMIT', 16))
+ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 60))
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 10))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 64))
+# Fragments of DASH/HLS formats fetched at once, per format profile
+FRAGMENT_CONCURRENCY = {
+    'mp4': int(os.environ.get('FRAGMENT_CONCURRENCY_MP4', 4)),
+    'mp3': int(os.environ.get('FRAGMENT_CONCURRENCY_MP3', 2)),
 }
+# Extra fragment connections shared by all downloads, on top of one per admitted download
+MAX_FRAGMENT_CONNECTIONS = int(os.environ.get('MAX_FRAGMENT_CONNECTIONS', MAX_CONCURRENT_DOWNLOADS * 2))
+
+# Streaming responses
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 64 * 1024))
+STREAM_START_TIMEOUT = float(os.environ.get('STREAM_START_TIMEOUT', 120))
+STREAM_POLL_INTERVAL = 0.1
+
+# Failed downloads, transient errors are retried, format errors retry the extracted info
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 2))
+DOWNLOAD_RETRY_BACKOFF = float(os.environ.get('DOWNLOAD_RETRY_BACKOFF', 1))
+# Wider selectors for format errors, mp4 may merge separate streams, mp3 has nothing wider than bestaudio/best
+FALLBACK_FORMATS = {'mp4': 'bv*[height<=480]+ba/bv*+ba/b'}
+
+# Multi-connection ranged downloads of progressive files, chosen per request
+RANGED_MAX_CONNECTIONS = int(os.environ.get('RANGED_MAX_CONNECTIONS', 8))
+# Smaller files go over one connection, splitting them costs more than it saves
+RANGED_MIN_BYTES = int(os.environ.get('RANGED_MIN_BYTES', 4 * 1024 ** 2))
+RANGED_CHUNK_SIZE = 256 * 1024
+RANGED_PROGRESS_INTERVAL = 0.1
+
+# On-demand profiling of single requests, disabled unless a token is set
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', '/tmp/profiles'))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+
+# Matches the 11 character id in the common YouTube URL shapes
+YOUTUBE_ID_RE = re.compile(
+    r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/|/v/)([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])'
+)
+# Only these hosts get the shared youtube:<id> key, anything else could claim a real video's entry
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                 'youtu.be', 'www.youtu.be', 'youtube-nocookie.com', 'www.youtube-nocookie.com')
+
+class Metric:
+    """Labelled metric rendered in the Prometheus text format"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels, extra=''):
+        pairs = [f'{k}="{v}"' for k, v in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{self._labels(labels)} {value}")
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = self._labels(labels, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {bucket_count}")
+                le = self._labels(labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+                lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+# Stage timings and attempts of the request being profiled on this thread
+PROFILE_LOCAL = threading.local()
+
+def trace(event, seconds=None):
+    """Note an event on this thread's profile trace, if a profile is running"""
+    events = getattr(PROFILE_LOCAL, 'events', None)
+    if events is not None:
+        events.append((time.perf_counter(), event, seconds))
+
+class StageHistogram(Histogram):
+    def observe(self, value, *labels):
+        super().observe(value, *labels)
+        trace(labels[0], value)
+
+class AttemptCounter(Counter):
+    def inc(self, *labels, amount=1):
+        super().inc(*labels, amount=amount)
+        trace(' '.join(labels))
+
+STAGE_SECONDS = StageHistogram(
+    'ytdl_stage_seconds', 'Time spent per request stage',
+    ('stage', 'format'), (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+DOWNLOADS_TOTAL = AttemptCounter(
+    'ytdl_downloads_total', 'yt-dlp download attempts by method and outcome',
+    ('method', 'outcome')
+)
+BYTES_SERVED = Counter('ytdl_bytes_served_total', 'Response body bytes sent to clients', ('format',))
+IN_FLIGHT = Gauge('ytdl_in_flight', 'Downloads and jobs currently running', ('kind',))
+
+ADMISSION_IN_USE = Gauge('ytdl_admission_in_use', 'Units of each resource currently held', ('resource',))
+ADMISSION_WAITING = Gauge('ytdl_admission_waiting', 'Requests queued for each resource', ('resource',))
+ADMISSION_REJECTED = Counter('ytdl_admission_rejected_total', 'Requests turned away with 429', ('resource',))
+
+class Overloaded(Exception):
+    """Raised when a resource's wait queue is full or the wait timed out"""
+
+    def __init__(self, resource, retry_after):
+        super().__init__(f"Server is busy ({resource}), please retry later")
+        self.resource = resource
+        self.retry_after = retry_after
+
+class ResourceLimiter:
+    """Semaphore over units of a resource with a bounded queue of waiters"""
+
+    def __init__(self, name, capacity, max_waiting, timeout):
+        self.name = name
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.in_use = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _reject(self):
+        ADMISSION_REJECTED.inc(self.name)
+        raise Overloaded(self.name, ADMISSION_RETRY_AFTER)
+
+    def _publish(self):
+        ADMISSION_IN_USE.set(self.in_use, self.name)
+        ADMISSION_WAITING.set(self.waiting, self.name)
+
+    def acquire(self, amount=1, blocking=True, bounded=True):
+        """Take units, waiting in line if allowed; returns the amount taken"""
+        amount = min(amount, self.capacity)
+        with self._cond:
+            # Newcomers queue behind existing waiters instead of jumping ahead
+            if not self.waiting and self.in_use + amount <= self.capacity:
+                self.in_use += amount
+                self._publish()
+                return amount
+            if not blocking or (bounded and self.waiting >= self.max_waiting):
+                self._reject()
+            
+            deadline = time.monotonic() + self.timeout if bounded else None
+            self.waiting += 1
+            self._publish()
+            try:
+                while self.in_use + amount > self.capacity:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._reject()
+                    self._cond.wait(remaining)
+                self.in_use += amount
+                return amount
+            finally:
+                self.waiting -= 1
+                self._publish()
+
+    def acquire_available(self, amount):
+        """Take up to amount units without waiting, possibly none; returns the amount taken"""
+        with self._cond:
+            if self.waiting:
+                return 0
+            amount = max(0, min(amount, self.capacity - self.in_use))
+            self.in_use += amount
+            self._publish()
+            return amount
+
+    def release(self, amount=1):
+        with self._cond:
+            self.in_use -= amount
+            self._publish()
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def hold(self, amount=1, blocking=True):
+        amount = self.acquire(amount, blocking)
+        try:
+            yield
+        finally:
+            self.release(amount)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'inUse': self.in_use,
+                'waiting': self.waiting,
+                'maxWaiting': self.max_waiting,
+            }
+
+NETWORK_LIMITER = ResourceLimiter('network', MAX_CONCURRENT_DOWNLOADS, ADMISSION_QUEUE_LIMIT, ADMISSION_TIMEOUT)
+TRANSCODE_LIMITER = ResourceLimiter('transcode', MAX_CONCURRENT_TRANSCODES, ADMISSION_QUEUE_LIMIT, ADMISSION_TIMEOUT)
+DISK_LIMITER = ResourceLimiter('disk', MAX_INFLIGHT_DOWNLOAD_BYTES, ADMISSION_QUEUE_LIMIT, ADMISSION_TIMEOUT)
+# Running plus queued jobs, POST /api/jobs never waits for a slot
+JOB_LIMITER = ResourceLimiter('jobs', JOB_WORKERS + JOB_QUEUE_LIMIT, 0, 0)
+# Never waited on, a busy server just downloads fragments one at a time
+FRAGMENT_LIMITER = ResourceLimiter('fragments', MAX_FRAGMENT_CONNECTIONS, 0, 0)
+
+# yt-dlp postprocessors that run ffmpeg
+TRANSCODING_POSTPROCESSORS = ('ExtractAudio', 'Merger', 'VideoConvertor', 'VideoRemuxer')
+
+class TranscodeGate:
+    """Holds a transcode slot while one of yt-dlp's ffmpeg postprocessors runs"""
+
+    def __init__(self):
+        self.held = False
+
+    def postprocessor_hook(self, d):
+        name = d.get('postprocessor', '')
+        if name not in TRANSCODING_POSTPROCESSORS and not name.startswith('Fixup'):
+            return
+        if d['status'] == 'started' and not self.held:
+            # Already admitted downloads wait as long as it takes for the CPU
+            TRANSCODE_LIMITER.acquire(bounded=False)
+            self.held = True
+        elif d['status'] == 'finished':
+            self.release()
+
+    def release(self):
+        if self.held:
+            self.held = False
+            TRANSCODE_LIMITER.release()
+
+class FragmentSlots:
+    """Fragment or range connections for one download, granted from whatever is free right now"""
+
+    def __init__(self, wanted):
+        # The first connection comes with the download's network slot
+        self.extra = FRAGMENT_LIMITER.acquire_available(wanted - 1)
+
+    @property
+    def concurrency(self):
+        return 1 + self.extra
+
+    def release(self):
+        if self.extra:
+            FRAGMENT_LIMITER.release(self.extra)
+            self.extra = 0
+
+def estimate_download_bytes(url):
+    """Disk to reserve for a download, from the cached info when there is one"""
+    info = FULL_INFO_CACHE.get(canonical_video_key(url), record=False)
+    if info:
+        size = info.get('filesize') or info.get('filesize_approx')
+        if size:
+            return int(size)
+    return DEFAULT_DOWNLOAD_BYTES
+
+def overloaded_response(error):
+    """429 response telling the client when to come back"""
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'retryAfter': error.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+class StageTimer:
+    """Splits one yt-dlp run into extract, download and postprocess time using its hooks"""
+
+    def __init__(self, format_type):
+        self.format_type = format_type
+        self.started = time.perf_counter()
+        self.download_started = None
+        self.download_finished = None
+        self.postprocess_started = None
+        self.postprocess_seconds = 0.0
+
+    def progress_hook(self, d):
+        now = time.perf_counter()
+        if self.download_started is None:
+            self.download_started = now
+        if d['status'] == 'finished':
+            self.download_finished = now
+
+    def postprocessor_hook(self, d):
+        now = time.perf_counter()
+        if d['status'] == 'started':
+            self.postprocess_started = now
+        elif d['status'] == 'finished' and self.postprocess_started is not None:
+            self.postprocess_seconds += now - self.postprocess_started
+            self.postprocess_started = None
+
+    def hook_opts(self, progress_hook=None):
+        hooks = [self.progress_hook] + ([progress_hook] if progress_hook else [])
+        return {'progress_hooks': hooks, 'postprocessor_hooks': [self.postprocessor_hook]}
+
+    def finish(self):
+        if self.download_started is None:
+            return
+        STAGE_SECONDS.observe(self.download_started - self.started, 'extract', self.format_type)
+        if self.download_finished is not None:
+            STAGE_SECONDS.observe(self.download_finished - self.download_started, 'download', self.format_type)
+        if self.postprocess_seconds:
+            STAGE_SECONDS.observe(self.postprocess_seconds, 'postprocess', self.format_type)
+
+def observe_send(response, format_type):
+    """Record send time and bytes for a response once it has been closed"""
+    started = time.perf_counter()
+    sent = [response.content_length]
+    if sent[0] is None:
+        sent[0] = 0
+        body = response.response
+
+        def counted():
+            for chunk in body:
+                sent[0] += len(chunk)
+                yield chunk
+        response.response = counted()
+    
+    def on_close():
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'send', format_type)
+        BYTES_SERVED.inc(format_type, amount=sent[0])
+    response.call_on_close(on_close)
+    return response
+
+class StackSampler:
+    """Samples one thread's Python stack into flamegraph collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+def requested_connections(value):
+    """Connections asked for with ?connections=, None for yt-dlp's defaults"""
+    if not value:
+        return None
+    try:
+        connections = int(value)
+    except ValueError:
+        raise ValueError('Connections must be a number') from None
+    return max(1, min(connections, RANGED_MAX_CONNECTIONS))
+
+def requested_profile():
+    """Profiler mode asked for by an admin, None when this request isn't profiled"""
+    mode = request.headers.get('X-Profile') or request.args.get('profile')
+    if not mode:
+        return None
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile_token') or ''
+    # Bytes, compare_digest refuses str with non-ASCII characters
+    if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        raise PermissionError('Invalid profile token')
+    if mode not in ('cprofile', 'stacks'):
+        raise ValueError('Profile must be either cprofile or stacks')
+    return mode
+
+def profiled(view):
+    """Run a route under cProfile or the stack sampler when an admin asks for it"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # No token configured means profiling is off and the route runs untouched
+        if not PROFILE_TOKEN:
+            return view(*args, **kwargs)
+        try:
+            mode = requested_profile()
+        except PermissionError as e:
+            return jsonify({'success': False, 'error': str(e)}), 403
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if mode is None:
+            return view(*args, **kwargs)
+        
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            path = PROFILE_DIR / f"{int(time.time())}-{view.__name__}-{uuid.uuid4().hex[:8]}.pstats"
+        else:
+            profiler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+            path = PROFILE_DIR / f"{int(time.time())}-{view.__name__}-{uuid.uuid4().hex[:8]}.collapsed"
+        
+        PROFILE_LOCAL.events = []
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        finally:
+            profiler.disable()
+            total = time.perf_counter() - started
+            events = PROFILE_LOCAL.events
+            PROFILE_LOCAL.events = None
+            if mode == 'cprofile':
+                profiler.dump_stats(str(path))
+            else:
+                profiler.dump(path)
+            
+            breakdown = ', '.join(
+                f"{event} {seconds:.3f}s" if seconds is not None else f"{event} @{at - started:.3f}s"
+                for at, event, seconds in events
+            )
+            # The token may have come in the query string, keep it out of the logs
+            query = urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'profile_token'])
+            logger.info(f"Profiled {request.path}{'?' + query if query else ''} in {total:.3f}s [{breakdown}] -> {path}")
+        response.headers['X-Profile-File'] = path.name
+        return response
+    return wrapper
+
+YTDL_POOL_CHECKOUTS = Counter(
+    'ytdl_ydl_pool_checkouts_total', 'YoutubeDL checkouts by whether a warm instance was reused',
+    ('reused',)
+)
+
+class PlayerCache(yt_dlp.cache.Cache):
+    """yt-dlp's on-disk cache, counting player lookups and dropping retired player versions"""
+
+    # Sections keyed by player version, js_<player>_<signature spec> and <player>
+    PLAYER_SECTIONS = ('youtube-sigfuncs', 'youtube-nsig')
+    hits = 0
+    misses = 0
+    _lock = threading.Lock()
+
+    def load(self, section, key, dtype='json', default=None, *, min_ver=None):
+        data = super().load(section, key, dtype, default, min_ver=min_ver)
+        if section in self.PLAYER_SECTIONS:
+            with self._lock:
+                if data is default:
+                    PlayerCache.misses += 1
+                else:
+                    PlayerCache.hits += 1
+        return data
+
+    def store(self, section, key, data, dtype='json'):
+        # Written to a temp file and renamed, concurrent workers never read half a file
+        super().store(section, key, data, dtype)
+        if section in self.PLAYER_SECTIONS and self.enabled:
+            self._prune(section)
+
+    @staticmethod
+    def _player_id(section, name):
+        key = name.rsplit('.', 1)[0]
+        if section == 'youtube-sigfuncs':
+            return key[len('js_'):].rsplit('_', 1)[0]
+        return key
+
+    def _prune(self, section):
+        """Keep the newest YTDLP_CACHE_PLAYERS player versions in a section"""
+        section_dir = Path(self._get_root_dir()) / section
+        newest = {}
+        files = []
+        for path in section_dir.glob('*.json'):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            player_id = self._player_id(section, path.name)
+            newest[player_id] = max(newest.get(player_id, 0), mtime)
+            files.append((path, player_id))
+        
+        keep = set(sorted(newest, key=newest.get, reverse=True)[:YTDLP_CACHE_PLAYERS])
+        for path, player_id in files:
+            if player_id not in keep:
+                logger.info(f"Dropping cached {section} for retired player {player_id}")
+                path.unlink(missing_ok=True)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            lookups = cls.hits + cls.misses
+            return {
+                'dir': YTDLP_CACHE_DIR,
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'hitRate': round(cls.hits / lookups, 4) if lookups else 0.0,
+            }
+
+def split_ranges(total, parts):
+    """Cut [0, total) into parts contiguous (start, stop) byte ranges"""
+    size = -(-total // parts)
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+class RangedHttpFD(HttpFD):
+    """Fetches a progressive file over several ranged connections into a preallocated file"""
+
+    FD_NAME = 'ranged'
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = dict(info_dict.get('http_headers') or {})
+        connections = self.params.get('http_range_connections') or 1
+        total = self._probe_size(url, headers)
+        # Servers without range support and small files take yt-dlp's usual path
+        if not total or total < RANGED_MIN_BYTES:
+            return super().real_download(filename, info_dict)
+        
+        tmpfilename = self.temp_name(filename)
+        self.report_destination(filename)
+        started = time.time()
+        progress = {'downloaded': 0, 'reported': 0.0}
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def on_bytes(amount):
+            with lock:
+                progress['downloaded'] += amount
+                now = time.time()
+                done = progress['downloaded']
+                if now - progress['reported'] < RANGED_PROGRESS_INTERVAL and done < total:
+                    return
+                progress['reported'] = now
+                elapsed = now - started
+                speed = done / elapsed if elapsed else None
+                self._hook_progress({
+                    'status': 'downloading',
+                    'filename': filename,
+                    'tmpfilename': tmpfilename,
+                    'downloaded_bytes': done,
+                    'total_bytes': total,
+                    'elapsed': elapsed,
+                    'speed': speed,
+                    'eta': (total - done) / speed if speed else None,
+                }, info_dict)
+        
+        fd = os.open(tmpfilename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, total)
+            on_bytes(0)
+            ranges = split_ranges(total, connections)
+            with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='range') as executor:
+                futures = [
+                    executor.submit(self._fetch_range, fd, url, headers, start, stop, on_bytes, failed)
+                    for start, stop in ranges
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    # The other ranges stop at their next chunk
+                    failed.set()
+                    raise
+        except Exception as e:
+            os.close(fd)
+            self.try_remove(tmpfilename)
+            raise DownloadError(f"Ranged download failed: {e}") from e
+        os.close(fd)
+        
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'filename': filename,
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
+
+    def _probe_size(self, url, headers):
+        """Full size of the file if the server honours byte ranges"""
+        try:
+            response = self.ydl.urlopen(YtdlpRequest(url, headers={**headers, 'Range': 'bytes=0-0'}))
+        except Exception:
+            return None
+        try:
+            match = re.match(r'bytes 0-0/(\d+)', response.headers.get('Content-Range', ''))
+            return int(match.group(1)) if response.status == 206 and match else None
+        finally:
+            response.close()
+
+    def _fetch_range(self, fd, url, headers, start, stop, on_bytes, failed):
+        """Write bytes [start, stop) at their offset, resuming from the last good byte on errors"""
+        retries = self.params.get('retries', 10)
+        attempt = 0
+        position = start
+        while position < stop and not failed.is_set():
+            attempt_start = position
+            try:
+                request_headers = {**headers, 'Range': f"bytes={position}-{stop - 1}"}
+                response = self.ydl.urlopen(YtdlpRequest(url, headers=request_headers))
+                try:
+                    if response.status != 206:
+                        raise DownloadError(f"Server ignored range {position}-{stop - 1}")
+                    while position < stop and not failed.is_set():
+                        chunk = response.read(min(RANGED_CHUNK_SIZE, stop - position))
+                        if not chunk:
+                            raise OSError(f"Connection closed at byte {position}")
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+                        on_bytes(len(chunk))
+                finally:
+                    response.close()
+            except Exception as e:
+                # Client errors won't go away by asking again
+                if isinstance(e, YtdlpHTTPError) and e.status < 500 and e.status not in (408, 429):
+                    raise
+                attempt = 1 if position > attempt_start else attempt + 1
+                if attempt > retries:
+                    raise
+                logger.warning(f"Range {start}-{stop - 1} failed at byte {position}, retry {attempt}/{retries}: {e}")
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 10))
+
+FRAGMENTED_PROTOCOLS = ('m3u8', 'm3u8_native', 'http_dash_segments', 'http_dash_segments_generator', 'ism', 'f4m')
+
+class RangedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that takes extra connections for fragmented or ranged downloads only while they run"""
+
+    def dl(self, name, info, subtitle=False, test=False):
+        protocol = determine_protocol(info) if info.get('url') else None
+        extra_allowed = not subtitle and not test
+        range_connections = self.params.get('http_range_connections') or 1
+        fragment_connections = self.params.get('fragment_connections') or 1
+        
+        if extra_allowed and range_connections > 1 and name != '-' and protocol in ('http', 'https'):
+            slots = FragmentSlots(range_connections)
+            try:
+                return self._ranged_dl(name, info, slots.concurrency)
+            finally:
+                slots.release()
+        if extra_allowed and fragment_connections > 1 and protocol in FRAGMENTED_PROTOCOLS:
+            slots = FragmentSlots(fragment_connections)
+            previous = self.params.get('concurrent_fragment_downloads', 1)
+            self.params['concurrent_fragment_downloads'] = slots.concurrency
+            try:
+                return super().dl(name, info, subtitle, test)
+            finally:
+                self.params['concurrent_fragment_downloads'] = previous
+                slots.release()
+        return super().dl(name, info, subtitle, test)
+
+    def _ranged_dl(self, name, info, connections):
+        fd = RangedHttpFD(self, dict(self.params, http_range_connections=connections))
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info)
+
+def create_ydl(ydl_opts):
+    """New YoutubeDL using the counting player cache"""
+    # YoutubeDL keeps the dict it is given as self.params, give it its own
+    ydl = RangedYoutubeDL(copy.deepcopy(ydl_opts))
+    ydl.cache = PlayerCache(ydl)
+    return ydl
+
+class YoutubeDLPool:
+    """Warm YoutubeDL instances per option profile, used by one request at a time"""
+
+    def __init__(self, max_idle, max_uses):
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def checkout(self, ydl_opts, outtmpl=None, progress_hooks=(), postprocessor_hooks=(), params=None):
+        """Borrow an instance for ydl_opts with this request's output template, hooks and params"""
+        profile = json.dumps(ydl_opts, sort_keys=True, default=repr)
+        with self._lock:
+            idle = self._idle.get(profile)
+            ydl, uses = idle.pop() if idle else (None, 0)
+        YTDL_POOL_CHECKOUTS.inc('true' if ydl is not None else 'false')
+        if ydl is None:
+            ydl = create_ydl(ydl_opts)
+        
+        self._prepare(ydl, outtmpl, progress_hooks, postprocessor_hooks)
+        params = params or {}
+        missing = object()
+        previous = {key: ydl.params.get(key, missing) for key in params}
+        ydl.params.update(params)
+        ok = False
+        try:
+            yield ydl
+            ok = True
+        finally:
+            self._prepare(ydl, None, (), ())
+            for key, value in previous.items():
+                if value is missing:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+            uses += 1
+            with self._lock:
+                idle = self._idle.setdefault(profile, [])
+                # Instances that failed mid-request may hold odd state, start fresh
+                keep = ok and uses < self.max_uses and len(idle) < self.max_idle
+                if keep:
+                    idle.append((ydl, uses))
+            if not keep:
+                ydl.close()
+
+    @staticmethod
+    def _prepare(ydl, outtmpl, progress_hooks, postprocessor_hooks):
+        """Reset the per-request state YoutubeDL keeps between downloads"""
+        if outtmpl is not None:
+            ydl.params['outtmpl']['default'] = outtmpl
+        ydl._progress_hooks = list(progress_hooks)
+        ydl._postprocessor_hooks = []
+        for pps in ydl._pps.values():
+            for pp in pps:
+                pp._progress_hooks = []
+        for hook in postprocessor_hooks:
+            ydl.add_postprocessor_hook(hook)
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+        ydl._printed_messages = set()
+
+    def reset_after_fork(self):
+        """Forget instances built by the parent, their connections and cookie jars are not ours"""
+        self._idle = {}
+        self._lock = threading.Lock()
+
+YDL_POOL = YoutubeDLPool(YTDL_POOL_MAX_IDLE, YTDL_POOL_MAX_USES)
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize, ttl, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Called with each value that expires, is pushed out or is replaced
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, record=True):
+        now = time.monotonic()
+        evicted = None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                    evicted = entry[1]
+                if record:
+                    self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                if record:
+                    self.hits += 1
+                return entry[1]
+        if evicted is not None:
+            self._evicted([evicted])
+        return None
+
+    def set(self, key, value, ttl=None):
+        now = time.monotonic()
+        expires = now + (self.ttl if ttl is None else ttl)
+        evicted = []
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None and previous[1] is not value:
+                evicted.append(previous[1])
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1][1])
+            if self.on_evict is not None:
+                # Expired entries nobody asks for again would otherwise wait for LRU
+                while self._data:
+                    oldest = next(iter(self._data))
+                    if self._data[oldest][0] > now:
+                        break
+                    evicted.append(self._data.pop(oldest)[1])
+        self._evicted(evicted)
+
+    def _evicted(self, values):
+        if self.on_evict is None:
+            return
+        for value in values:
+            try:
+                self.on_evict(value)
+            except Exception as e:
+                logger.warning(f"Cache eviction callback failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+INFO_CACHE = TTLCache(INFO_CACHE_SIZE, INFO_CACHE_TTL)
+FULL_INFO_CACHE = TTLCache(FULL_INFO_CACHE_SIZE, FULL_INFO_CACHE_TTL)
+
+def canonical_video_key(url):
+    """Build a cache key that is stable across different URLs for the same video"""
+    url = url.strip()
+    try:
+        # Scheme-less input like youtube.com/watch?v=... still names the host
+        host = (urlsplit(url if '://' in url else f"//{url}").hostname or '').rstrip('.')
+    except ValueError:
+        return url
+    if host not in YOUTUBE_HOSTS:
+        return url
+    match = YOUTUBE_ID_RE.search(url)
+    # Playlist URLs resolve to more than the single video, keep them distinct
+    if match and 'list=' not in url:
+        return f"youtube:{match.group(1)}"
+    return url
+
+def info_ydl_opts():
+    """yt-dlp options for metadata extraction"""
+    ydl_opts = CUSTOM_YTDLP_OPTS.copy()
+    ydl_opts['extract_flat'] = 'in_playlist'
+    return ydl_opts
+
+def download_ydl_opts(format_type):
+    """yt-dlp options for the primary download method"""
+    ydl_opts = CUSTOM_YTDLP_OPTS.copy()
+    ydl_opts.update(download_format_opts(format_type))
+    return ydl_opts
 
 def get_video_info(url):
     """Extract video information using yt-dlp"""
+    cache_key = canonical_video_key(url)
+    cached = INFO_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ydl_opts = CUSTOM_YTDLP_OPTS.copy()
-        ydl_opts['extract_flat'] = 'in_playlist'
+        ydl_opts = info_ydl_opts()
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with YDL_POOL.checkout(ydl_opts) as ydl, STAGE_SECONDS.time('extract', 'info'):
             info = ydl.extract_info(url, download=False)
             
-            return {
+            result = {
                 'success': True,
                 'title': info.get('title', 'Unknown Title'),
                 'description': info.get('description', ''),
@@ -57,61 +1042,378 @@ def get_video_info(url):
                 'channel': info.get('uploader', 'Unknown Channel'),
                 'viewCount': info.get('view_count', 0),
             }
+            # Keep the extracted formats so a following download can skip extraction
+            if info.get('_type', 'video') == 'video' and info.get('formats'):
+                FULL_INFO_CACHE.set(cache_key, ydl.sanitize_info(info, remove_private_keys=True))
+        INFO_CACHE.set(cache_key, result)
+        return result
     except Exception as e:
         logger.error(f"Error getting video info: {e}")
+        result = {
+            'success': False,
+            'error': str(e),
+            'code': classify_download_error(e)[1]
+        }
+        # Remember failures briefly so a bad URL is not re-extracted on every retry
+        INFO_CACHE.set(cache_key, result, ttl=INFO_CACHE_NEGATIVE_TTL)
+        return result
+
+# Shared by all batch requests, so INFO_WORKERS caps extraction for the process
+INFO_EXECUTOR = ThreadPoolExecutor(max_workers=INFO_WORKERS, thread_name_prefix='info')
+
+def batch_info_lines(urls):
+    """Yield one NDJSON line per URL as soon as its info is ready"""
+    # Different URLs for the same video are only extracted once
+    groups = OrderedDict()
+    for index, url in enumerate(urls):
+        groups.setdefault(canonical_video_key(url), []).append((index, url))
+    queue = iter(groups.values())
+    pending = {}
+    
+    def submit_next():
+        members = next(queue, None)
+        if members is not None:
+            pending[INFO_EXECUTOR.submit(get_video_info, members[0][1])] = members
+    
+    for _ in range(BATCH_INFO_CONCURRENCY):
+        submit_next()
+    
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                members = pending.pop(future)
+                submit_next()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                for index, url in members:
+                    yield json.dumps({'index': index, 'url': url, **result}) + '\n'
+    finally:
+        # Client went away, don't start the rest
+        for future in pending:
+            future.cancel()
+
+def close_playlist(state):
+    """Close the YoutubeDL an open playlist's entry generator was using"""
+    with state['lock']:
+        state['ydl'].close()
+
+# Open playlists by cursor token, so the next page resumes the lazy entry list
+PLAYLIST_CURSORS = TTLCache(256, PLAYLIST_CURSOR_TTL, on_evict=close_playlist)
+
+def encode_cursor(token, offset):
+    payload = json.dumps({'t': token, 'o': offset}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (token, offset) for a cursor, raising ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        token, offset = str(payload['t']), int(payload['o'])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if offset < 0:
+        raise ValueError('Invalid cursor')
+    return token, offset
+
+def open_playlist(url):
+    """Resolve a playlist or channel without fetching more than its first page"""
+    ydl_opts = info_ydl_opts()
+    # Left open on success, the entry generator keeps using it until PLAYLIST_CURSORS evicts it
+    ydl = create_ydl(ydl_opts)
+    try:
+        info = ydl.extract_info(url, download=False, process=False)
+        while info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    except Exception:
+        ydl.close()
+        raise
+    
+    entries = info.get('entries') or []
+    # Paged lists slice themselves, generators are wrapped so consumed entries are kept
+    if not hasattr(entries, 'getslice') and not isinstance(entries, list):
+        entries = LazyList(entries)
+    return {'ydl': ydl, 'info': info, 'entries': entries, 'lock': threading.Lock()}
+
+def playlist_entry(entry):
+    thumbnails = entry.get('thumbnails') or []
+    return {
+        'id': entry.get('id'),
+        'title': entry.get('title', 'Unknown Title'),
+        'url': entry.get('url') or entry.get('webpage_url'),
+        'duration': entry.get('duration', 0),
+        'channel': entry.get('uploader') or entry.get('channel'),
+        'thumbnail': entry.get('thumbnail') or (thumbnails[-1].get('url') if thumbnails else ''),
+        'viewCount': entry.get('view_count', 0),
+    }
+
+def get_playlist_page(url, cursor=None, limit=PLAYLIST_PAGE_SIZE):
+    """Return one page of playlist entries and a cursor for the next one"""
+    token, offset = decode_cursor(cursor) if cursor else (None, 0)
+    state = PLAYLIST_CURSORS.get(token) if token else None
+    opened = state is None
+    
+    try:
+        if opened:
+            # New playlist or cursor from another worker, start over and skip ahead
+            state = open_playlist(url)
+            token = uuid.uuid4().hex
+            if state['info'].get('_type') not in ('playlist', 'multi_video'):
+                close_playlist(state)
+                return {
+                    'success': False,
+                    'error': 'URL is not a playlist or channel',
+                    'code': 'not_playlist'
+                }
+        
+        try:
+            with state['lock']:
+                entries = state['entries']
+                # One extra entry tells us whether there is another page
+                if hasattr(entries, 'getslice'):
+                    page = entries.getslice(offset, offset + limit + 1)
+                else:
+                    page = entries[offset:offset + limit + 1]
+        except Exception:
+            # Only close what nobody else can reach, a cached cursor is closed on eviction
+            if opened:
+                close_playlist(state)
+            raise
+        PLAYLIST_CURSORS.set(token, state)
+        
+        info = state['info']
+        has_more = len(page) > limit
+        return {
+            'success': True,
+            'id': info.get('id'),
+            'title': info.get('title', 'Unknown Playlist'),
+            'channel': info.get('uploader') or info.get('channel'),
+            'entryCount': info.get('playlist_count'),
+            'offset': offset,
+            'entries': [playlist_entry(e) for e in page[:limit] if e],
+            'nextCursor': encode_cursor(token, offset + limit) if has_more else None,
+        }
+    except Exception as e:
+        logger.error(f"Error getting playlist: {e}")
         return {
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            'code': classify_download_error(e)[1]
         }
 
-def download_video_alternative(url, format_type='mp4'):
-    """Alternative download method with better headers"""
-    unique_id = str(uuid.uuid4())
-    output_template = f"/tmp/{unique_id}.%(ext)s"
+def extract_or_reuse_info(ydl, url, extracted=None):
+    """Download using the info dict from a recent /api/info call or an earlier attempt when available"""
+    if extracted and 'info' in extracted:
+        return ydl.process_ie_result(copy.deepcopy(extracted['info']), download=True)
     
-    # Different yt-dlp options for downloading
-    ydl_opts = CUSTOM_YTDLP_OPTS.copy()
-    ydl_opts['outtmpl'] = output_template
+    cached = FULL_INFO_CACHE.get(canonical_video_key(url))
+    if cached is not None:
+        if extracted is not None:
+            extracted['info'] = cached
+        try:
+            return ydl.process_ie_result(copy.deepcopy(cached), download=True)
+        except Exception as e:
+            # Extracting again won't bring back a missing format or a deleted video
+            if classify_download_error(e)[0] in ('format', 'permanent'):
+                raise
+            # Format URLs may have expired, extract again before giving up
+            logger.warning(f"Cached info could not be reused, re-extracting: {e}")
+            if extracted is not None:
+                del extracted['info']
+    
+    info = ydl.extract_info(url, download=False, process=False)
+    # Playlists and redirects are extracted again anyway, only plain videos are kept
+    if extracted is not None and info.get('_type', 'video') == 'video':
+        extracted['info'] = copy.deepcopy(info)
+    return ydl.process_ie_result(info, download=True)
+
+# HTTP status for each permanent error code, anything else is a 500
+DOWNLOAD_ERROR_STATUS = {
+    'unsupported_url': 400,
+    'not_playlist': 400,
+    'not_found': 404,
+    'unavailable': 404,
+    'private': 403,
+    'age_restricted': 403,
+    'members_only': 403,
+    'geo_restricted': 403,
+    'blocked': 403,
+    'not_live': 409,
+    'format_unavailable': 422,
+    'network_error': 502,
+}
+
+# Message fragments of permanent errors, checked in order
+PERMANENT_ERROR_MESSAGES = (
+    ('unsupported url', 'unsupported_url'),
+    ('private video', 'private'),
+    ('sign in to confirm your age', 'age_restricted'),
+    ('age-restricted', 'age_restricted'),
+    ('members-only', 'members_only'),
+    ('join this channel', 'members_only'),
+    ('not available in your country', 'geo_restricted'),
+    ("not a bot", 'blocked'),
+    ('live event will begin', 'not_live'),
+    ('premieres in', 'not_live'),
+    ('video unavailable', 'unavailable'),
+    ('has been removed', 'unavailable'),
+    ('no longer available', 'unavailable'),
+)
+
+def error_chain(error):
+    """The error and everything it wraps, outermost first"""
+    chain = []
+    while error is not None and error not in chain:
+        chain.append(error)
+        exc_info = getattr(error, 'exc_info', None)
+        error = (
+            (exc_info[1] if exc_info else None)
+            or getattr(error, 'cause', None)
+            or error.__cause__
+            or error.__context__
+        )
+    return chain
+
+def classify_download_error(error):
+    """Sort a download failure into (kind, code), kind being transient, format, permanent or unknown"""
+    chain = error_chain(error)
+    message = ' '.join(str(e) for e in chain).lower()
+    
+    if 'requested format is not available' in message:
+        return 'format', 'format_unavailable'
+    
+    for e in chain:
+        if isinstance(e, YtdlpHTTPError):
+            if e.status in (404, 410):
+                return 'permanent', 'not_found'
+            if e.status in (408, 429) or e.status >= 500:
+                return 'transient', 'network_error'
+        elif isinstance(e, (TransportError, ContentTooShortError, ConnectionError, TimeoutError)):
+            return 'transient', 'network_error'
     
+    for e in chain:
+        if isinstance(e, UnsupportedError):
+            return 'permanent', 'unsupported_url'
+        if isinstance(e, GeoRestrictedError):
+            return 'permanent', 'geo_restricted'
+    for fragment, code in PERMANENT_ERROR_MESSAGES:
+        if fragment in message:
+            return 'permanent', code
+    # yt-dlp marks errors that are about the video rather than a bug as expected
+    if any(isinstance(e, ExtractorError) and e.expected for e in chain):
+        return 'permanent', 'unavailable'
+    return 'unknown', None
+
+def download_error_status(result):
+    return DOWNLOAD_ERROR_STATUS.get(result.get('code'), 500)
+
+def download_format_opts(format_type):
+    """yt-dlp options that decide what ends up in the downloaded file"""
     if format_type == 'mp3':
-        ydl_opts['format'] = 'bestaudio/best'
-        ydl_opts['postprocessors'] = [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }]
-    else:
-        ydl_opts['format'] = 'best[height<=480]/best[height<=360]/worst'
-        ydl_opts['merge_output_format'] = 'mp4'
+        return {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+        }
+    return {
+        'format': 'best[height<=480]/best[height<=360]/worst',
+        'merge_output_format': 'mp4',
+    }
+
+def download_video_alternative(url, format_type='mp4', progress_hook=None, connections=None):
+    """Alternative download method with better headers, over several connections if asked"""
+    # Filled with the info dict once extracted, so retries don't extract again
+    extracted = {}
+    ydl_opts = download_ydl_opts(format_type)
+    method = 'primary'
+    retries = 0
+    
+    while True:
+        try:
+            result = download_attempt(url, format_type, ydl_opts, progress_hook, connections, extracted)
+            DOWNLOADS_TOTAL.inc(method, 'success')
+            if method == 'format_fallback':
+                result['fallback'] = True
+            return result
+        except Exception as e:
+            error = e
+            kind, code = classify_download_error(e)
+            logger.error(f"Error downloading video ({kind}): {e}")
+            DOWNLOADS_TOTAL.inc(method, 'failure')
+        
+        if kind == 'transient' and retries < DOWNLOAD_RETRIES:
+            retries += 1
+            method = 'retry'
+            time.sleep(DOWNLOAD_RETRY_BACKOFF * 2 ** (retries - 1))
+            continue
+        if kind == 'format' and method != 'format_fallback' and 'info' in extracted and format_type in FALLBACK_FORMATS:
+            # Same info, a selector that also takes video and audio as separate streams
+            ydl_opts = dict(ydl_opts, format=FALLBACK_FORMATS[format_type])
+            method = 'format_fallback'
+            continue
+        # Permanent errors and exhausted retries fail fast without extracting again
+        if kind != 'unknown':
+            return {
+                'success': False,
+                'error': f"Download failed: {str(error)}",
+                'code': code
+            }
+        # Try one more time with simpler options
+        return download_video_simple_fallback(url, format_type, progress_hook)
+
+def download_attempt(url, format_type, ydl_opts, progress_hook=None, connections=None, extracted=None):
+    """One yt-dlp run of a download, raising whatever went wrong"""
+    unique_id = str(uuid.uuid4())
+    output_template = str(TEMP_DIR / f"{unique_id}.%(ext)s")
+    
+    timer = StageTimer(format_type)
+    hooks = timer.hook_opts(progress_hook)
+    gate = TranscodeGate()
+    hooks['postprocessor_hooks'].append(gate.postprocessor_hook)
+    # Connections wanted, RangedYoutubeDL.dl takes them once it knows the format's protocol
+    params = {'fragment_connections': connections or FRAGMENT_CONCURRENCY.get(format_type, 1)}
+    if connections:
+        params['http_range_connections'] = connections
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+        with YDL_POOL.checkout(ydl_opts, output_template, params=params, **hooks) as ydl:
+            info = extract_or_reuse_info(ydl, url, extracted)
             downloaded_file = ydl.prepare_filename(info)
             
             if format_type == 'mp3' and not downloaded_file.endswith('.mp3'):
                 downloaded_file = downloaded_file.rsplit('.', 1)[0] + '.mp3'
             
+            timer.finish()
             return {
                 'success': True,
                 'file_path': downloaded_file,
                 'title': clean_filename(info.get('title', 'download'))
             }
-    except Exception as e:
-        logger.error(f"Error downloading video: {e}")
-        # Try one more time with simpler options
-        return download_video_simple_fallback(url, format_type)
+    except Exception:
+        remove_download_files(unique_id)
+        raise
+    finally:
+        gate.release()
 
-def download_video_simple_fallback(url, format_type='mp4'):
+def download_video_simple_fallback(url, format_type='mp4', progress_hook=None):
     """Simplest possible download as fallback"""
     unique_id = str(uuid.uuid4())
-    output_template = f"/tmp/{unique_id}.%(ext)s"
+    output_template = str(TEMP_DIR / f"{unique_id}.%(ext)s")
     
     ydl_opts = {
-        'outtmpl': output_template,
         'quiet': True,
+        'cachedir': YTDLP_CACHE_DIR,
         'format': 'worst' if format_type == 'mp4' else 'worstaudio/worst',
     }
+    timer = StageTimer(format_type)
+    hooks = timer.hook_opts(progress_hook)
+    gate = TranscodeGate()
+    hooks['postprocessor_hooks'].append(gate.postprocessor_hook)
     
     if format_type == 'mp3':
         ydl_opts['postprocessors'] = [{
@@ -120,33 +1422,894 @@ def download_video_simple_fallback(url, format_type='mp4'):
         }]
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with YDL_POOL.checkout(ydl_opts, output_template, **hooks) as ydl:
             info = ydl.extract_info(url, download=True)
             downloaded_file = ydl.prepare_filename(info)
             
             if format_type == 'mp3' and not downloaded_file.endswith('.mp3'):
                 downloaded_file = downloaded_file.rsplit('.', 1)[0] + '.mp3'
             
+            timer.finish()
+            DOWNLOADS_TOTAL.inc('fallback', 'success')
             return {
                 'success': True,
                 'file_path': downloaded_file,
-                'title': clean_filename(info.get('title', 'download'))
+                'title': clean_filename(info.get('title', 'download')),
+                'fallback': True
             }
     except Exception as e:
         logger.error(f"Fallback download also failed: {e}")
+        DOWNLOADS_TOTAL.inc('fallback', 'failure')
+        return {
+            'success': False,
+            'error': f"Download failed: {str(e)}. Railway IP may be blocked by YouTube.",
+            'code': classify_download_error(e)[1]
+        }
+    finally:
+        gate.release()
+
+class DownloadCache:
+    """Content-addressed store of finished downloads with a byte budget"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, key, format_type):
+        return self.directory / f"{key}.{format_type}", self.directory / f"{key}.json"
+
+    def get(self, key, format_type, record=True):
+        path, meta_path = self._paths(key, format_type)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # Recency lives in atime, mtime stays the publish time the ETag is built from
+            st = path.stat()
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except (OSError, ValueError):
+            if record:
+                self.misses += 1
+            return None
+        if record:
+            self.hits += 1
+        return {
+            'success': True,
+            'file_path': str(path),
+            'title': meta.get('title', 'download'),
+            'cached': True
+        }
+
+    def put(self, key, format_type, file_path, title):
+        """Move a finished download into the cache and return its new path"""
+        if os.path.getsize(file_path) > self.max_bytes:
+            return file_path
+        path, meta_path = self._paths(key, format_type)
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        meta_staging = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        shutil.move(file_path, staging)
+        with open(meta_staging, 'w') as f:
+            json.dump({'title': title, 'created': time.time()}, f)
+        # Publish with renames so readers never see a partial file
+        os.replace(meta_staging, meta_path)
+        os.replace(staging, path)
+        self.evict()
+        return str(path)
+
+    def evict(self):
+        """Remove least recently used artifacts until the cache fits its budget"""
+        with self._lock:
+            entries = []
+            for path in self.directory.iterdir():
+                if path.suffix in ('.json', '.tmp') or not path.is_file():
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                path.with_suffix('.json').unlink(missing_ok=True)
+                total -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
         return {
+            'maxBytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+DOWNLOAD_CACHE = DownloadCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES)
+
+def download_cache_key(url, format_type):
+    """Key a download on the video and every option that changes the output"""
+    payload = json.dumps(
+        [canonical_video_key(url), format_type, download_format_opts(format_type)],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+class SingleFlight:
+    """Run one call per key at a time and share its result with concurrent callers"""
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.shared += 1
+        
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+DOWNLOAD_FLIGHTS = SingleFlight()
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock shared between gunicorn workers"""
+    while True:
+        f = open(path, 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        # The janitor may have removed the file while we waited, lock the one now at path
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        f.close()
+    try:
+        yield
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+def remove_stale_lock(path):
+    """Delete a lock file nobody holds, returning whether it was removed"""
+    try:
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Unlinked while locked, so a waiter sees the file is gone and opens a new one
+            path.unlink()
+            return True
+    except OSError:
+        return False
+
+def artifact_etag(path, st=None):
+    """Strong ETag for cached artifacts, their request key plus the size, inode and mtime of this copy"""
+    path = Path(path)
+    if path.parent != DOWNLOAD_CACHE_DIR:
+        # One-off downloads fall back to Werkzeug's mtime and size based tag
+        return True
+    # The key names the request, not the bytes, a re-download after eviction may differ
+    st = st or path.stat()
+    return f"{path.stem}-{st.st_size:x}-{st.st_ino:x}-{st.st_mtime_ns:x}"
+
+def download_with_cache(url, format_type='mp4', progress_hook=None, connections=None):
+    """Serve a previous identical download from disk or download and publish it"""
+    cache_key = download_cache_key(url, format_type)
+    cached = DOWNLOAD_CACHE.get(cache_key, format_type)
+    if cached is not None:
+        return cached
+    
+    def download_and_publish():
+        with file_lock(DOWNLOAD_LOCK_DIR / f"{cache_key}.lock"):
+            # Another worker may have finished the same download while we waited
+            cached = DOWNLOAD_CACHE.get(cache_key, format_type, record=False)
+            if cached is not None:
+                return cached
+            
+            with NETWORK_LIMITER.hold(), DISK_LIMITER.hold(estimate_download_bytes(url)):
+                IN_FLIGHT.inc('download')
+                try:
+                    result = download_video_alternative(url, format_type, progress_hook, connections)
+                finally:
+                    IN_FLIGHT.dec('download')
+            # Fallback downloads are lower quality than the key promises, don't keep them
+            if result['success'] and not result.get('fallback'):
+                try:
+                    result['file_path'] = DOWNLOAD_CACHE.put(
+                        cache_key, format_type, result['file_path'], result['title']
+                    )
+                except OSError as e:
+                    logger.warning(f"Could not add download to cache: {e}")
+            return result
+    
+    # Concurrent requests for the same download wait for the first one
+    return DOWNLOAD_FLIGHTS.do(cache_key, download_and_publish)
+
+class JobStore:
+    """Download job state, kept on disk so every worker can report on it"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, job_id):
+        return self.directory / f"{job_id}.json"
+
+    def create(self, url, format_type):
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'format': format_type,
+            'state': 'queued',
+            'stage': None,
+            'progress': 0.0,
+            'bytesDone': 0,
+            'totalBytes': None,
+            'eta': None,
+            'title': None,
+            'error': None,
+            'errorCode': None,
+            'filePath': None,
+            'createdAt': now,
+            'updatedAt': now,
+        }
+        self._write(job)
+        return job
+
+    def update(self, job, **fields):
+        job.update(fields)
+        job['updatedAt'] = time.time()
+        self._write(job)
+
+    def get(self, job_id):
+        # Job ids are generated hex uuids, anything else cannot be a job file
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, job):
+        path = self._path(job['id'])
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(staging, 'w') as f:
+            json.dump(job, f)
+        os.replace(staging, path)
+
+JOBS = JobStore(JOBS_DIR)
+# Downloads run here instead of on the request-serving threads
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='download-job')
+
+def download_when_admitted(url, format_type='mp4', progress_hook=None, on_wait=None):
+    """download_with_cache for background work, which waits for capacity instead of a 429"""
+    while True:
+        try:
+            return download_with_cache(url, format_type, progress_hook)
+        except Overloaded as e:
+            if on_wait:
+                on_wait()
+            time.sleep(e.retry_after)
+
+def run_job(job):
+    """Run a queued download job and record its progress"""
+    JOBS.update(job, state='running', stage='extracting')
+    IN_FLIGHT.inc('job')
+    last_update = [0.0]
+    
+    def progress_hook(d):
+        now = time.monotonic()
+        finished = d['status'] != 'downloading'
+        if not finished and now - last_update[0] < JOB_PROGRESS_INTERVAL:
+            return
+        last_update[0] = now
+        done = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        JOBS.update(
+            job,
+            stage='processing' if finished else 'downloading',
+            bytesDone=done,
+            totalBytes=total,
+            eta=d.get('eta'),
+            progress=round(min(done * 100 / total, 100.0), 1) if total else job['progress']
+        )
+    
+    try:
+        result = download_when_admitted(
+            job['url'], job['format'], progress_hook,
+            on_wait=lambda: JOBS.update(job, stage='waiting')
+        )
+    except Exception as e:
+        logger.error(f"Download job {job['id']} error: {e}")
+        result = {'success': False, 'error': f"Server error: {str(e)}"}
+    finally:
+        IN_FLIGHT.dec('job')
+        JOB_LIMITER.release()
+    
+    if result['success']:
+        JOBS.update(
+            job,
+            state='finished',
+            stage=None,
+            progress=100.0,
+            eta=0,
+            title=result['title'],
+            filePath=result['file_path']
+        )
+    else:
+        JOBS.update(job, state='failed', stage=None, error=result['error'], errorCode=result.get('code'))
+
+def public_job(job):
+    """Job fields that are safe to return to clients"""
+    job = dict(job)
+    job.pop('filePath', None)
+    return job
+
+class StreamInterrupted(Exception):
+    """Raised mid-response so the server aborts the connection instead of ending a truncated file"""
+
+class StreamingDownload:
+    """Background download whose partial file can be read while it is written"""
+
+    def __init__(self, url, format_type='mp4'):
+        self.url = url
+        self.format_type = format_type
+        self.partial_path = None
+        self.final_path = None
+        self.title = None
+        self.result = None
+        self.overloaded = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _hook(self, d):
+        if d['status'] != 'downloading' or not d.get('tmpfilename') or d['tmpfilename'] == self.partial_path:
+            return
+        # A retry or format fallback writes a new file, remember the latest one
+        self.partial_path = d['tmpfilename']
+        self.final_path = d.get('filename')
+        if self.title is None:
+            self.title = clean_filename(d.get('info_dict', {}).get('title', 'download'))
+        self.started.set()
+
+    def _run(self):
+        try:
+            # Going through the cache means an abandoned stream still gets published
+            self.result = download_with_cache(self.url, self.format_type, self._hook)
+        except Overloaded as e:
+            self.overloaded = e
+            self.result = {'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f"Streaming download error: {e}")
+            self.result = {'success': False, 'error': f"Server error: {str(e)}"}
+        finally:
+            self.done.set()
+            self.started.set()
+
+    def open(self):
+        """Open the file being written, or the finished file if there is none"""
+        for path in (self.partial_path, self.final_path):
+            if path:
+                try:
+                    return open(path, 'rb')
+                except FileNotFoundError:
+                    continue
+        if self.done.is_set() and self.result['success']:
+            return open(self.result['file_path'], 'rb')
+        return None
+
+    def chunks(self, f):
+        """Yield the file as it grows until the download has finished"""
+        sent = 0
+        try:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if chunk:
+                    sent += len(chunk)
+                    yield chunk
+                    continue
+                if not self.done.is_set():
+                    if not sent and f.name not in (self.partial_path, self.final_path):
+                        # Nothing sent yet, follow the retry to the file it is writing
+                        following = self.open()
+                        if following is not None:
+                            f.close()
+                            f = following
+                    self.done.wait(STREAM_POLL_INTERVAL)
+                    continue
+                if not self.result['success']:
+                    raise StreamInterrupted(f"Download for {self.url} failed mid-stream: {self.result['error']}")
+                # Done and drained, make sure we streamed the file that was kept
+                if not self._is_result_file(f):
+                    if sent:
+                        raise StreamInterrupted(f"Stream for {self.url} was replaced mid-transfer")
+                    f.close()
+                    f = open(self.result['file_path'], 'rb')
+                    continue
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                sent += len(chunk)
+                yield chunk
+        finally:
+            f.close()
+            if self.done.is_set() and self.result['success']:
+                schedule_removal(self.result['file_path'])
+
+    def _is_result_file(self, f):
+        if not self.result['success']:
+            return True
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(self.result['file_path']).st_ino
+        except OSError:
+            return True
+
+def content_disposition(filename):
+    """Attachment header with an ASCII fallback and the UTF-8 name"""
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii') or 'download'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+def stream_download(url, format_type='mp4'):
+    """Respond as soon as yt-dlp starts writing instead of after it finishes"""
+    stream = StreamingDownload(url, format_type).start()
+    stream.started.wait(STREAM_START_TIMEOUT)
+    
+    if stream.overloaded is not None:
+        raise stream.overloaded
+    if stream.done.is_set() and not stream.result['success']:
+        return jsonify(stream.result), download_error_status(stream.result)
+    
+    f = stream.open()
+    if f is None:
+        return jsonify({
             'success': False,
-            'error': f"Download failed: {str(e)}. Railway IP may be blocked by YouTube."
+            'error': 'Download did not start in time'
+        }), 504
+    
+    title = stream.title or stream.result['title']
+    return observe_send(Response(
+        stream.chunks(f),
+        mimetype='video/mp4' if format_type == 'mp4' else 'audio/mpeg',
+        headers={'Content-Disposition': content_disposition(f"{title}.{format_type}")}
+    ), format_type)
+
+def pipe_download(url, format_type='mp4'):
+    """Stream yt-dlp's stdout straight into the response without writing to disk"""
+    info = get_video_info(url)
+    if not info['success']:
+        return jsonify(info), download_error_status(info)
+    
+    # Slots are held until the response is closed
+    slots = contextlib.ExitStack()
+    try:
+        slots.enter_context(NETWORK_LIMITER.hold())
+        if format_type == 'mp3':
+            slots.enter_context(TRANSCODE_LIMITER.hold())
+        procs = start_pipeline(url, format_type)
+        first = procs[-1].stdout.read1(STREAM_CHUNK_SIZE)
+    except BaseException:
+        slots.close()
+        raise
+    
+    if not first:
+        errors = []
+        for proc in procs:
+            proc.wait()
+            errors.append(proc.stderr.read().decode(errors='replace').strip())
+        close_pipeline(procs)
+        slots.close()
+        error = '; '.join(e for e in errors if e)
+        logger.error(f"Pipe download failed: {error}")
+        # Only yt-dlp's stderr is left, which is enough for the message-based classes
+        result = {
+            'success': False,
+            'error': f"Download failed: {error or 'no output'}",
+            'code': classify_download_error(DownloadError(error))[1]
         }
+        return jsonify(result), download_error_status(result)
+    
+    response = Response(
+        pipe_chunks(procs, first),
+        mimetype='video/mp4' if format_type == 'mp4' else 'audio/mpeg',
+        headers={'Content-Disposition': content_disposition(f"{clean_filename(info['title'])}.{format_type}")}
+    )
+    response.call_on_close(lambda: close_pipeline(procs))
+    response.call_on_close(slots.close)
+    return observe_send(response, format_type)
+
+def start_pipeline(url, format_type):
+    """Start yt-dlp writing to stdout, followed by ffmpeg for mp3"""
+    format_opts = download_format_opts(format_type)
+    full_info = FULL_INFO_CACHE.get(canonical_video_key(url))
+    command = [
+        sys.executable, '-m', 'yt_dlp',
+        '--quiet', '--no-warnings', '--no-progress',
+        '--retries', str(CUSTOM_YTDLP_OPTS['retries']),
+        # Share the player JS and signature cache the in-process downloads fill
+        '--cache-dir', YTDLP_CACHE_DIR,
+        '--format', format_opts['format'],
+        '--output', '-',
+    ]
+    if full_info is not None:
+        # Hand over the info we already extracted instead of extracting again
+        command += ['--load-info-json', '-']
+    else:
+        command += ['--user-agent', CUSTOM_YTDLP_OPTS['http_headers']['User-Agent'], '--', url]
+    
+    procs = [subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if full_info is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )]
+    if full_info is not None:
+        try:
+            procs[0].stdin.write(json.dumps(full_info).encode())
+            procs[0].stdin.close()
+        except OSError:
+            pass
+    
+    if format_type == 'mp3':
+        # Encode while downloading, the pipes between the processes give backpressure
+        quality = format_opts['postprocessors'][0].get('preferredquality', '192')
+        try:
+            procs.append(subprocess.Popen(
+                [
+                    'ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error',
+                    '-i', 'pipe:0', '-vn', '-codec:a', 'libmp3lame', '-b:a', f"{quality}k",
+                    '-f', 'mp3', 'pipe:1',
+                ],
+                stdin=procs[0].stdout,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            ))
+        except OSError:
+            close_pipeline(procs)
+            raise
+        # Only ffmpeg should hold the read end, so it sees EOF when yt-dlp exits
+        procs[0].stdout.close()
+    
+    return procs
+
+def pipe_chunks(procs, first):
+    """Relay the last process's stdout and stop the pipeline if the client goes away"""
+    try:
+        yield first
+        while True:
+            chunk = procs[-1].stdout.read1(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        for proc in procs:
+            if proc.wait() != 0:
+                logger.error(f"Pipe process {proc.args[0]} exited with {proc.returncode}")
+    finally:
+        close_pipeline(procs)
+
+def close_pipeline(procs):
+    """Kill whatever is still running in a pipeline and close its pipes"""
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        for pipe in (proc.stdout, proc.stderr):
+            if pipe and not pipe.closed:
+                pipe.close()
+
+def remove_download_files(unique_id):
+    """Delete everything a failed download left behind"""
+    for path in TEMP_DIR.glob(f"{unique_id}.*"):
+        path.unlink(missing_ok=True)
+
+def is_temp_file(path):
+    """Whether a file is a private download rather than a cached artifact"""
+    return Path(path).parent == TEMP_DIR
+
+def schedule_removal(path):
+    """Delete a served temp file once requests sharing it have opened it"""
+    if not is_temp_file(path):
+        return
+    timer = threading.Timer(SERVED_FILE_GRACE, Path(path).unlink, kwargs={'missing_ok': True})
+    timer.daemon = True
+    timer.start()
+
+class DiskJanitor:
+    """Removes orphaned downloads and keeps the temp directory within its budget"""
+
+    def __init__(self, temp_dir, max_age, max_bytes, interval):
+        self.temp_dir = Path(temp_dir)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.removed_files = 0
+        self.removed_bytes = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the sweep thread once per process"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='disk-janitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Disk janitor error: {e}")
+            time.sleep(self.interval)
+
+    def _files(self, directory):
+        files = []
+        for path in Path(directory).iterdir():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _remove(self, path, size):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        self.removed_files += 1
+        self.removed_bytes += size
+
+    def sweep(self):
+        """Delete stale files, then the oldest ones until usage is within budget"""
+        now = time.time()
+        remaining = []
+        for mtime, size, path in self._files(self.temp_dir):
+            if now - mtime > self.max_age:
+                self._remove(path, size)
+            else:
+                remaining.append((mtime, size, path))
+        
+        total = sum(size for _, size, _ in remaining)
+        for mtime, size, path in sorted(remaining):
+            if total <= self.max_bytes:
+                break
+            # Never pull a file out from under a running download
+            if now - mtime < ACTIVE_FILE_WINDOW:
+                continue
+            self._remove(path, size)
+            total -= size
+        
+        # Staging files from interrupted publishes and finished job records
+        for directory, suffix in ((DOWNLOAD_CACHE_DIR, '.tmp'), (JOBS_DIR, '')):
+            for mtime, size, path in self._files(directory):
+                if path.name.endswith(suffix) and now - mtime > self.max_age:
+                    self._remove(path, size)
+        
+        # One lock file per cache key ever downloaded, skipping any still held
+        for mtime, size, path in self._files(DOWNLOAD_LOCK_DIR):
+            if path.suffix == '.lock' and now - mtime > self.max_age and remove_stale_lock(path):
+                self.removed_files += 1
+
+    def usage(self):
+        temp_files = self._files(self.temp_dir)
+        cache_files = self._files(DOWNLOAD_CACHE_DIR)
+        return {
+            'tempBytes': sum(size for _, size, _ in temp_files),
+            'tempFiles': len(temp_files),
+            'tempMaxBytes': self.max_bytes,
+            'cacheBytes': sum(size for _, size, _ in cache_files),
+            'cacheMaxBytes': DOWNLOAD_CACHE_MAX_BYTES,
+            'removedFiles': self.removed_files,
+            'removedBytes': self.removed_bytes,
+        }
+
+JANITOR = DiskJanitor(TEMP_DIR, TEMP_MAX_AGE, TEMP_MAX_BYTES, JANITOR_INTERVAL)
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink for zipfile whose output is handed out in pieces"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def playlist_zip_chunks(entries, format_type):
+    """Download playlist entries in parallel and yield a ZIP as each one finishes"""
+    sink = ZipStreamBuffer()
+    # Stored entries, the media is already compressed
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+    executor = ThreadPoolExecutor(max_workers=PLAYLIST_ZIP_CONCURRENCY, thread_name_prefix='playlist-zip')
+    futures = {
+        executor.submit(download_when_admitted, entry['url'], format_type): (index, entry)
+        for index, entry in enumerate(entries)
+    }
+    failures = []
+    try:
+        for future in as_completed(futures):
+            index, entry = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if not result['success']:
+                failures.append(f"{index + 1:03d} {entry['title']}: {result['error']}")
+                continue
+            
+            zinfo = zipfile.ZipInfo(f"{index + 1:03d} - {result['title']}.{format_type}", time.localtime()[:6])
+            zinfo.file_size = os.path.getsize(result['file_path'])
+            try:
+                with open(result['file_path'], 'rb') as src, archive.open(zinfo, 'w') as dst:
+                    for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b''):
+                        dst.write(chunk)
+                        yield sink.drain()
+            finally:
+                schedule_removal(result['file_path'])
+            yield sink.drain()
+        
+        if failures:
+            archive.writestr('failed.txt', '\n'.join(failures) + '\n')
+        archive.close()
+        yield sink.drain()
+    finally:
+        # Client went away or we are done, don't start downloads nobody will receive
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def playlist_zip_response(url, format_type='mp4', limit=PLAYLIST_ZIP_MAX_ENTRIES):
+    """Resolve the first entries of a playlist and stream them back as a ZIP"""
+    page = get_playlist_page(url, limit=limit)
+    if not page['success']:
+        return jsonify(page), download_error_status(page)
+    
+    entries = [e for e in page['entries'] if e.get('url')]
+    if not entries:
+        return jsonify({
+            'success': False,
+            'error': 'Playlist has no downloadable entries'
+        }), 404
+    
+    return observe_send(Response(
+        playlist_zip_chunks(entries, format_type),
+        mimetype='application/zip',
+        headers={'Content-Disposition': content_disposition(f"{clean_filename(page['title'] or 'playlist')}.zip")}
+    ), format_type)
+
+# LOADED once extractors and the pool are ready, DONE once WARMUP_URL has been extracted too
+WARM_UP_LOADED = threading.Event()
+WARM_UP_DONE = threading.Event()
+WARM_UP_LOCK = threading.Lock()
+WARM_UP_PRIME_LOCK = threading.Lock()
+
+def preload_modules():
+    """Import the extractor modules lazy loading would defer, safe to run before forking"""
+    # Touching real_class imports the module behind each lazy extractor
+    for ie_key in WARMUP_EXTRACTORS:
+        yt_dlp.extractor.get_info_extractor(ie_key).real_class
+    # First used mid-download otherwise
+    import _strptime
+    import encodings.idna
+
+def warm_up(prime=True):
+    """Load extractors, fill the YoutubeDL pool and prime caches before serving, prime=False leaves WARMUP_URL for a later call"""
+    started = time.perf_counter()
+    with WARM_UP_LOCK:
+        if not WARM_UP_LOADED.is_set():
+            try:
+                preload_modules()
+                for ydl_opts in (info_ydl_opts(), download_ydl_opts('mp4'), download_ydl_opts('mp3')):
+                    with YDL_POOL.checkout(ydl_opts) as ydl:
+                        for ie_key in WARMUP_EXTRACTORS:
+                            ydl.get_info_extractor(ie_key)
+            except Exception as e:
+                logger.warning(f"Warm-up incomplete: {e}")
+            WARM_UP_LOADED.set()
+    if not prime and WARMUP_URL:
+        return
+    
+    # Separate lock, so a prime=False caller never waits on the network round trip
+    with WARM_UP_PRIME_LOCK:
+        if WARM_UP_DONE.is_set():
+            return
+        try:
+            if WARMUP_URL:
+                get_video_info(WARMUP_URL)
+        except Exception as e:
+            logger.warning(f"Warm-up incomplete: {e}")
+        finally:
+            # /api/ready keeps gating on this
+            WARM_UP_DONE.set()
+            logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+def prime_in_background():
+    """Extract WARMUP_URL on a background thread unless that is finished or under way"""
+    if not WARM_UP_DONE.is_set() and not WARM_UP_PRIME_LOCK.locked():
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def reset_after_fork():
+    """Drop per-process state a forked worker must not share with its parent"""
+    global WARM_UP_LOADED, WARM_UP_DONE, WARM_UP_LOCK, WARM_UP_PRIME_LOCK
+    YDL_POOL.reset_after_fork()
+    WARM_UP_LOADED = threading.Event()
+    WARM_UP_DONE = threading.Event()
+    WARM_UP_LOCK = threading.Lock()
+    WARM_UP_PRIME_LOCK = threading.Lock()
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+def process_memory():
+    """Resident memory of this process in bytes, split into shared and private pages"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
 
 def clean_filename(filename):
     """Clean filename for safe download"""
-    import re
     filename = re.sub(r'[<>:"/\\|?*]', '', filename)
     if len(filename) > 50:
         filename = filename[:50]
     return filename.strip()
 
+@app.before_request
+def start_janitor():
+    """Make sure this worker is sweeping its download directory"""
+    JANITOR.start()
+
+@app.before_request
+def start_warm_up():
+    """Warm up in the background when no server hook did it before serving"""
+    if not WARM_UP_LOCK.locked():
+        prime_in_background()
+
 @app.route('/')
 def index():
     """Root endpoint - server status"""
@@ -162,10 +2325,63 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
+        'timestamp': time.time(),
+        'infoCache': INFO_CACHE.stats(),
+        'fullInfoCache': FULL_INFO_CACHE.stats(),
+        'downloadCache': DOWNLOAD_CACHE.stats(),
+        'playerCache': PlayerCache.stats(),
+        'disk': JANITOR.usage(),
+        'memory': process_memory(),
+        'admission': {
+            limiter.name: limiter.stats()
+            for limiter in (NETWORK_LIMITER, TRANSCODE_LIMITER, DISK_LIMITER, JOB_LIMITER, FRAGMENT_LIMITER)
+        }
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    lines = []
+    for metric in (
+        STAGE_SECONDS, DOWNLOADS_TOTAL, BYTES_SERVED, IN_FLIGHT,
+        ADMISSION_IN_USE, ADMISSION_WAITING, ADMISSION_REJECTED, YTDL_POOL_CHECKOUTS,
+    ):
+        lines.extend(metric.render())
+    
+    caches = {'info': INFO_CACHE, 'full_info': FULL_INFO_CACHE, 'download': DOWNLOAD_CACHE, 'player': PlayerCache}
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    for metric, key, kind, documentation in (
+        ('ytdl_cache_hits_total', 'hits', 'counter', 'Cache hits'),
+        ('ytdl_cache_misses_total', 'misses', 'counter', 'Cache misses'),
+        ('ytdl_cache_hit_ratio', 'hitRate', 'gauge', 'Fraction of cache lookups that hit'),
+    ):
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for cache_name, cache_stats in stats.items():
+            lines.append(f'{metric}{{cache="{cache_name}"}} {cache_stats[key]}')
+    
+    lines.append("# HELP ytdl_single_flight_shared_total Downloads that waited on an identical in-flight download")
+    lines.append("# TYPE ytdl_single_flight_shared_total counter")
+    lines.append(f"ytdl_single_flight_shared_total {DOWNLOAD_FLIGHTS.shared}")
+    
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint, not ready until warm-up has finished"""
+    if not WARM_UP_DONE.is_set():
+        return jsonify({
+            'status': 'warming_up',
+            'timestamp': time.time()
+        }), 503
+    
+    return jsonify({
+        'status': 'ready',
         'timestamp': time.time()
     })
 
 @app.route('/api/info', methods=['GET'])
+@profiled
 def video_info():
     """Get video information"""
     url = request.args.get('url')
@@ -179,11 +2395,92 @@ def video_info():
     logger.info(f"Getting info for URL: {url}")
     return jsonify(get_video_info(url))
 
+@app.route('/api/info/batch', methods=['POST'])
+def batch_video_info():
+    """Get information for many videos, streamed as NDJSON in completion order"""
+    data = request.get_json(silent=True) or {}
+    # {"urls": [...]} or just the list
+    urls = data if isinstance(data, list) else data.get('urls') if isinstance(data, dict) else None
+    
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        return jsonify({
+            'success': False,
+            'error': 'urls must be a non-empty list of URLs'
+        }), 400
+    
+    if len(urls) > BATCH_INFO_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f"At most {BATCH_INFO_MAX_URLS} URLs per batch"
+        }), 400
+    
+    logger.info(f"Getting info for {len(urls)} URLs")
+    return Response(batch_info_lines(urls), mimetype='application/x-ndjson')
+
+@app.route('/api/playlist', methods=['GET'])
+def playlist():
+    """Get a page of playlist or channel entries"""
+    url = request.args.get('url')
+    cursor = request.args.get('cursor')
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'URL parameter is required'
+        }), 400
+    
+    try:
+        limit = int(request.args.get('limit', PLAYLIST_PAGE_SIZE))
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid limit or cursor'
+        }), 400
+    limit = max(1, min(limit, PLAYLIST_MAX_PAGE_SIZE))
+    
+    logger.info(f"Getting playlist page for URL: {url}")
+    result = get_playlist_page(url, cursor, limit)
+    return jsonify(result), 200 if result['success'] else download_error_status(result)
+
+@app.route('/api/download/playlist', methods=['GET'])
+def download_playlist():
+    """Download the entries of a playlist as one streamed ZIP archive"""
+    url = request.args.get('url')
+    format_type = request.args.get('format', 'mp4')
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'URL parameter is required'
+        }), 400
+    
+    if format_type not in ['mp4', 'mp3']:
+        return jsonify({
+            'success': False,
+            'error': 'Format must be either mp4 or mp3'
+        }), 400
+    
+    try:
+        limit = int(request.args.get('limit', PLAYLIST_ZIP_MAX_ENTRIES))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid limit'
+        }), 400
+    limit = max(1, min(limit, PLAYLIST_ZIP_MAX_ENTRIES))
+    
+    logger.info(f"Playlist download request: {format_type} for {url}")
+    return playlist_zip_response(url, format_type, limit)
+
 @app.route('/api/download', methods=['GET'])
+@profiled
 def download():
     """Download video/audio with fallback methods"""
     url = request.args.get('url')
     format_type = request.args.get('format', 'mp4')
+    stream = request.args.get('stream', '').lower()
     
     if not url:
         return jsonify({
@@ -197,24 +2494,47 @@ def download():
             'error': 'Format must be either mp4 or mp3'
         }), 400
     
+    try:
+        connections = requested_connections(request.args.get('connections'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     logger.info(f"Download request: {format_type} for {url}")
     
     try:
-        # First try alternative method
-        result = download_video_alternative(url, format_type)
+        # Pipe mode never touches disk, mp3 is encoded by ffmpeg on the fly
+        if stream == 'pipe':
+            return pipe_download(url, format_type)
+        # Progressive mp4 is a single file, so it can be sent while it downloads
+        if stream in ('1', 'true', 'yes') and format_type == 'mp4':
+            return stream_download(url, format_type)
+        
+        # Serve from the download cache or try alternative method,
+        # streaming modes read the file in order so only this one splits it into ranges
+        result = download_with_cache(url, format_type, connections=connections)
         
         if not result['success']:
-            return jsonify(result), 500
+            return jsonify(result), download_error_status(result)
         
         # Send file
         filename = f"{result['title']}.{format_type}"
-        return send_file(
+        response = send_file(
             result['file_path'],
             as_attachment=True,
             download_name=filename,
-            mimetype='video/mp4' if format_type == 'mp4' else 'audio/mpeg'
+            mimetype='video/mp4' if format_type == 'mp4' else 'audio/mpeg',
+            etag=artifact_etag(result['file_path']),
+            conditional=True
         )
+        # Cached files stay, one-off downloads are removed once sent
+        response.call_on_close(lambda: schedule_removal(result['file_path']))
+        return observe_send(response, format_type)
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Download endpoint error: {e}")
         return jsonify({
@@ -222,6 +2542,92 @@ def download():
             'error': f"Server error: {str(e)}"
         }), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a download and return its job id right away"""
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, dict):
+        return jsonify({
+            'success': False,
+            'error': 'Request body must be a JSON object'
+        }), 400
+    url = data.get('url') or request.args.get('url')
+    format_type = data.get('format') or request.args.get('format', 'mp4')
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'URL parameter is required'
+        }), 400
+    
+    if format_type not in ['mp4', 'mp3']:
+        return jsonify({
+            'success': False,
+            'error': 'Format must be either mp4 or mp3'
+        }), 400
+    
+    try:
+        JOB_LIMITER.acquire(blocking=False)
+    except Overloaded as e:
+        return overloaded_response(e)
+    
+    job = JOBS.create(url, format_type)
+    JOB_EXECUTOR.submit(run_job, job)
+    logger.info(f"Queued job {job['id']}: {format_type} for {url}")
+    
+    return jsonify({
+        'success': True,
+        'jobId': job['id'],
+        'statusUrl': f"/api/jobs/{job['id']}",
+        'fileUrl': f"/api/jobs/{job['id']}/file"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the state and progress of a download job"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    return jsonify({'success': True, 'job': public_job(job)})
+
+@app.route('/api/jobs/<job_id>/file', methods=['GET'])
+def job_file(job_id):
+    """Send the file produced by a finished download job"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    if job['state'] != 'finished':
+        return jsonify({
+            'success': False,
+            'error': f"Job is {job['state']}",
+            'job': public_job(job)
+        }), 409
+    
+    if not os.path.exists(job['filePath']):
+        return jsonify({
+            'success': False,
+            'error': 'Job file is no longer available'
+        }), 410
+    
+    format_type = job['format']
+    return observe_send(send_file(
+        job['filePath'],
+        as_attachment=True,
+        download_name=f"{job['title']}.{format_type}",
+        mimetype='video/mp4' if format_type == 'mp4' else 'audio/mpeg',
+        etag=artifact_etag(job['filePath']),
+        conditional=True
+    ), format_type)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    warm_up()
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""ASGI entry point for serving many slow downloads from one process.
+
+Run with: gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+
+/api/download runs the download on a thread pool and sends the file without
+blocking the event loop, every other route is the Flask app on worker threads.
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_etags, parse_if_range_header, parse_range_header, quote_etag
+
+from app import (
+    app,
+    logger,
+    download_with_cache,
+    download_error_status,
+    requested_connections,
+    content_disposition,
+    schedule_removal,
+    artifact_etag,
+    Overloaded,
+    warm_up,
+    prime_in_background,
+    STAGE_SECONDS,
+    BYTES_SERVED,
+    STREAM_CHUNK_SIZE,
+)
+
+# Threads running yt-dlp, each one is a download in progress
+ASGI_DOWNLOAD_THREADS = int(os.environ.get('ASGI_DOWNLOAD_THREADS', 32))
+# Threads running the Flask routes, these return quickly
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+download_executor = ThreadPoolExecutor(max_workers=ASGI_DOWNLOAD_THREADS, thread_name_prefix='asgi-download')
+wsgi_application = WSGIMiddleware(app, workers=ASGI_WSGI_THREADS)
+
+async def send_json(send, payload, status=200, headers=()):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def watch_disconnect(receive, disconnected):
+    """Flag the client going away so the send loop can stop early"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+def request_headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+def requested_range(headers, etag, size):
+    """Byte range to send as (start, stop), None for the whole file, False if unsatisfiable"""
+    byte_range = parse_range_header(headers.get('range'))
+    # Multiple ranges would need a multipart body, the whole file is a valid answer too
+    if byte_range is None or len(byte_range.ranges) != 1:
+        return None
+    # A stale If-Range means the client's partial copy is outdated, send everything
+    if_range = headers.get('if-range')
+    if if_range and parse_if_range_header(if_range).etag != etag:
+        return None
+    return byte_range.range_for_length(size) or False
+
+async def send_download(send, receive, scope, result, format_type):
+    """Stream a downloaded file to the client, honouring Range and conditional headers"""
+    loop = asyncio.get_running_loop()
+    path = result['file_path']
+    f = await loop.run_in_executor(None, open, path, 'rb')
+    disconnected = asyncio.Event()
+    watcher = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+    started = time.perf_counter()
+    sent = 0
+    try:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        etag = artifact_etag(path, st)
+        if etag is True:
+            etag = f"{int(st.st_mtime)}-{size}"
+        headers = request_headers(scope)
+        response_headers = [
+            (b'content-type', b'video/mp4' if format_type == 'mp4' else b'audio/mpeg'),
+            (b'content-disposition', content_disposition(f"{result['title']}.{format_type}").encode()),
+            (b'etag', quote_etag(etag).encode()),
+            (b'accept-ranges', b'bytes'),
+            (b'access-control-allow-origin', b'*'),
+        ]
+
+        if parse_etags(headers.get('if-none-match')).contains(etag):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        byte_range = requested_range(headers, etag, size)
+        if byte_range is False:
+            response_headers.append((b'content-range', f"bytes */{size}".encode()))
+            await send({'type': 'http.response.start', 'status': 416, 'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        status = 200
+        start, stop = 0, size
+        if byte_range is not None:
+            status = 206
+            start, stop = byte_range
+            response_headers.append((b'content-range', f"bytes {start}-{stop - 1}/{size}".encode()))
+            f.seek(start)
+        response_headers.append((b'content-length', str(stop - start).encode()))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        remaining = stop - start
+        while not disconnected.is_set():
+            chunk = await loop.run_in_executor(None, f.read, min(STREAM_CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            more = bool(chunk) and remaining > 0
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+            sent += len(chunk)
+            if not more:
+                break
+    finally:
+        watcher.cancel()
+        f.close()
+        schedule_removal(path)
+        STAGE_SECONDS.observe(time.perf_counter() - started, 'send', format_type)
+        BYTES_SERVED.inc(format_type, amount=sent)
+
+async def download(scope, receive, send):
+    """Non-blocking version of the /api/download route"""
+    params = parse_qs(scope['query_string'].decode())
+    url = params.get('url', [None])[0]
+    format_type = params.get('format', ['mp4'])[0]
+
+    if not url:
+        return await send_json(send, {
+            'success': False,
+            'error': 'URL parameter is required'
+        }, 400)
+
+    if format_type not in ['mp4', 'mp3']:
+        return await send_json(send, {
+            'success': False,
+            'error': 'Format must be either mp4 or mp3'
+        }, 400)
+
+    try:
+        connections = requested_connections(params.get('connections', [None])[0])
+    except ValueError as e:
+        return await send_json(send, {
+            'success': False,
+            'error': str(e)
+        }, 400)
+
+    logger.info(f"Download request: {format_type} for {url}")
+
+    response_started = False
+
+    async def tracked_send(message):
+        nonlocal response_started
+        if message['type'] == 'http.response.start':
+            response_started = True
+        await send(message)
+
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            download_executor, functools.partial(download_with_cache, url, format_type, connections=connections)
+        )
+
+        if not result['success']:
+            return await send_json(send, result, download_error_status(result))
+
+        await send_download(tracked_send, receive, scope, result, format_type)
+    except Overloaded as e:
+        await send_json(send, {
+            'success': False,
+            'error': str(e),
+            'retryAfter': e.retry_after
+        }, 429, [(b'retry-after', str(e.retry_after).encode())])
+    except Exception as e:
+        if response_started:
+            # Headers are out, the server drops the connection once we return mid-body
+            logger.error(f"Download endpoint error after the response started: {e}")
+            return
+        logger.error(f"Download endpoint error: {e}")
+        await send_json(send, {
+            'success': False,
+            'error': f"Server error: {str(e)}"
+        }, 500)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Returns at once when gunicorn's post_worker_init already loaded this worker,
+            # WARMUP_URL is extracted in the background while /api/ready reports not ready
+            await asyncio.get_running_loop().run_in_executor(download_executor, functools.partial(warm_up, prime=False))
+            prime_in_background()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            download_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    """Route plain downloads to the async handler and the rest to Flask"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    # Streaming and pipe modes already send while downloading, Flask handles them,
+    # as well as profiled requests
+    is_plain_download = (
+        scope['type'] == 'http'
+        and scope['method'] == 'GET'
+        and scope['path'] == '/api/download'
+        and not {'stream', 'profile'} & parse_qs(scope['query_string'].decode()).keys()
+        and not any(name.lower() == b'x-profile' for name, _ in scope['headers'])
+    )
+    if is_plain_download:
+        return await download(scope, receive, send)
+
+    await wsgi_application(scope, receive, send)
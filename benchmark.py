@@ -0,0 +1,447 @@
+"""Benchmark /api/info and /api/download against a local fake video host.
+
+Starts a local HTTP server with synthetic media and pages the generic
+extractor understands, runs the app under gunicorn, drives it at each
+concurrency level and writes the results as JSON:
+
+    python benchmark.py --concurrency 1,8,32 --requests 200 --output results.json
+
+The hls scenario downloads a fragmented stream; sweep the fragment
+concurrency against a slow host to see how wall time scales with it:
+
+    python benchmark.py --scenarios hls --concurrency 1 --requests 5 \
+        --host-latency 0.05 --fragment-concurrency 1,2,4,8
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+CHUNK_SIZE = 64 * 1024
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class FakeVideoHost:
+    """Serves /video/<id>.mp4 of synthetic bytes, /watch/<id> pages describing them
+    as a JSON-LD VideoObject and /hls/<id>.m3u8 streams of the same size split into segments"""
+
+    def __init__(self, video_bytes, rate=0, latency=0.0, segments=20):
+        self.video_bytes = video_bytes
+        self.segments = segments
+        # Bytes per second per response, 0 for unthrottled
+        self.rate = rate
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def url(self, video_id):
+        return f"http://127.0.0.1:{self.port}/watch/{video_id}"
+
+    def hls_url(self, video_id):
+        return f"http://127.0.0.1:{self.port}/hls/{video_id}.m3u8"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-host', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_GET(self, head=False):
+                with host._lock:
+                    host.requests += 1
+                if host.latency:
+                    time.sleep(host.latency)
+                path = urlsplit(self.path).path
+                if path.startswith('/watch/'):
+                    self.send_page(path[len('/watch/'):], head)
+                elif path.startswith('/video/') and path.endswith('.mp4'):
+                    self.send_video(head)
+                elif path.startswith('/hls/') and path.endswith('.m3u8'):
+                    self.send_playlist(path[len('/hls/'):-len('.m3u8')], head)
+                elif path.startswith('/hls/') and path.endswith('.ts'):
+                    self.send_bytes(host.video_bytes // host.segments, 'video/mp2t', head)
+                else:
+                    self.send_error(404)
+
+            def send_page(self, video_id, head):
+                media = f"http://127.0.0.1:{host.port}/video/{quote(video_id)}.mp4"
+                video_object = {
+                    '@context': 'https://schema.org',
+                    '@type': 'VideoObject',
+                    'name': f"Benchmark video {video_id}",
+                    'contentUrl': media,
+                    'encodingFormat': 'video/mp4',
+                    'width': 640,
+                    'height': 360,
+                }
+                body = (
+                    '<!DOCTYPE html><html><head>'
+                    f'<title>Benchmark video {video_id}</title>'
+                    f'<meta property="og:title" content="Benchmark video {video_id}">'
+                    f'<script type="application/ld+json">{json.dumps(video_object)}</script>'
+                    '</head><body></body></html>'
+                ).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def send_playlist(self, video_id, head):
+                lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+                for i in range(host.segments):
+                    lines += ['#EXTINF:2.0,', f"{quote(video_id)}/{i}.ts"]
+                lines.append('#EXT-X-ENDLIST')
+                body = ('\n'.join(lines) + '\n').encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def send_video(self, head):
+                self.send_bytes(host.video_bytes, 'video/mp4', head)
+
+            def send_bytes(self, size, content_type, head):
+                start, stop = 0, size
+                byte_range = self.headers.get('Range', '')
+                if byte_range.startswith('bytes='):
+                    first, _, last = byte_range[len('bytes='):].partition('-')
+                    start = int(first or 0)
+                    stop = min(int(last) + 1, size) if last else size
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{stop - 1}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(stop - start))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+                if head:
+                    return
+                chunk = b'\0' * CHUNK_SIZE
+                remaining = stop - start
+                while remaining > 0:
+                    n = min(CHUNK_SIZE, remaining)
+                    self.wfile.write(chunk[:n])
+                    remaining -= n
+                    if host.rate:
+                        time.sleep(n / host.rate)
+
+        return Handler
+
+def process_tree_rss(pid):
+    """Resident bytes of pid and its direct children, read from /proc"""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+class RSSSampler:
+    """Tracks the peak RSS of a process tree on a background thread"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = 0
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._stop.clear()
+
+class AppServer:
+    """The app under gunicorn with its own scratch directories"""
+
+    def __init__(self, app, workers, worker_class=None, env=None):
+        self.port = free_port()
+        self.scratch = tempfile.mkdtemp(prefix='ytdl-bench-')
+        cmd = [
+            sys.executable, '-m', 'gunicorn', app,
+            '--bind', f"127.0.0.1:{self.port}",
+            '--workers', str(workers),
+            '--timeout', '300',
+        ]
+        if worker_class:
+            cmd += ['--worker-class', worker_class]
+        self.env = dict(os.environ)
+        self.env.update({
+            'TEMP_DIR': os.path.join(self.scratch, 'downloads'),
+            'DOWNLOAD_CACHE_DIR': os.path.join(self.scratch, 'download-cache'),
+            'JOBS_DIR': os.path.join(self.scratch, 'jobs'),
+            'YTDLP_CACHE_DIR': os.path.join(self.scratch, 'yt-dlp-cache'),
+        })
+        self.env.update(env or {})
+        self.cmd = cmd
+        self.process = None
+
+    def start(self, timeout=60):
+        self.process = subprocess.Popen(
+            self.cmd, env=self.env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {self.process.returncode}")
+            try:
+                status, _, _, _, _ = request('127.0.0.1', self.port, '/api/ready')
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('gunicorn did not become ready')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+def request(host, port, path, timeout=300, keep_body=False):
+    """GET path, returning (status, body size, seconds to first byte, total seconds, body or None)"""
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        first = response.read(1)
+        ttfb = time.perf_counter() - started
+        size = len(first)
+        body = [first] if keep_body else None
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if keep_body:
+                body.append(chunk)
+        return response.status, size, ttfb, time.perf_counter() - started, b''.join(body) if keep_body else None
+    finally:
+        conn.close()
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def summarize(samples, elapsed):
+    ok = [s for s in samples if s['status'] == 200 and not s.get('error')]
+    errors = [s['error'] for s in samples if s.get('error')]
+    latency = [s['seconds'] * 1000 for s in ok]
+    ttfb = [s['ttfb'] * 1000 for s in ok]
+    return {
+        'requests': len(samples),
+        'ok': len(ok),
+        'errors': len(samples) - len(ok),
+        'firstError': errors[0] if errors else None,
+        'statuses': {str(code): sum(1 for s in samples if s['status'] == code) for code in sorted({s['status'] for s in samples})},
+        'seconds': round(elapsed, 3),
+        'throughputRps': round(len(ok) / elapsed, 3) if elapsed else None,
+        'bytes': sum(s['bytes'] for s in ok),
+        'latencyMs': {f"p{p}": round(percentile(latency, p), 2) if latency else None for p in (50, 95, 99)},
+        'ttfbMs': {f"p{p}": round(percentile(ttfb, p), 2) if ttfb else None for p in (50, 95, 99)},
+    }
+
+def scenario_path(scenario, host, video_id, connections=None):
+    if scenario == 'info':
+        return f"/api/info?url={quote(host.url(video_id), safe='')}"
+    if scenario == 'download':
+        extra = f"&connections={connections}" if connections else ''
+        return f"/api/download?url={quote(host.url(video_id), safe='')}&format=mp4{extra}"
+    if scenario == 'stream':
+        return f"/api/download?url={quote(host.url(video_id), safe='')}&format=mp4&stream=1"
+    if scenario == 'hls':
+        return f"/api/download?url={quote(host.hls_url(video_id), safe='')}&format=mp4"
+    raise ValueError(f"Unknown scenario {scenario}")
+
+def run_scenario(server, host, scenario, concurrency, total, unique, run_id, connections=None):
+    """Send total requests with concurrency in flight, each to its own or a shared video"""
+    def one(i):
+        video_id = f"{run_id}-{scenario}-{concurrency}-{i if unique else 0}"
+        path = scenario_path(scenario, host, video_id, connections)
+        try:
+            status, size, ttfb, seconds, body = request('127.0.0.1', server.port, path, keep_body=scenario == 'info')
+        except OSError as e:
+            return {'status': 0, 'bytes': 0, 'ttfb': 0, 'seconds': 0, 'error': str(e)}
+        sample = {'status': status, 'bytes': size, 'ttfb': ttfb, 'seconds': seconds}
+        if body is not None:
+            # /api/info reports extraction failures as 200 with success: false
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = {'error': 'Invalid JSON response'}
+            if not payload.get('success'):
+                sample['error'] = payload.get('error') or 'Request failed'
+        return sample
+
+    with RSSSampler(server.process.pid) as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(one, range(total)))
+        elapsed = time.perf_counter() - started
+    result = summarize(samples, elapsed)
+    result['peakRssBytes'] = rss.peak
+    return result
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default='info,download', help='comma separated: info, download, stream, hls')
+    parser.add_argument('--concurrency', default='1,8', help='comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=50, help='requests per scenario and concurrency level')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--app', default='app:app', help='WSGI/ASGI target, e.g. asgi:application')
+    parser.add_argument('--worker-class', default=None, help='e.g. gthread or uvicorn.workers.UvicornWorker')
+    parser.add_argument('--video-bytes', type=int, default=5 * 1024 ** 2, help='size of each synthetic video')
+    parser.add_argument('--host-rate', type=int, default=0, help='fake host bytes/second per response, 0 for unlimited')
+    parser.add_argument('--host-latency', type=float, default=0.0, help='fake host seconds added per request')
+    parser.add_argument('--hls-segments', type=int, default=20, help='segments per hls stream')
+    parser.add_argument('--fragment-concurrency', default=None, help='comma separated FRAGMENT_CONCURRENCY values to sweep')
+    parser.add_argument('--connections', type=int, default=None, help='ranged connections per download request')
+    parser.add_argument('--shared', action='store_true', help='every request asks for the same video (cache path)')
+    parser.add_argument('--env', action='append', default=[], help='NAME=VALUE passed to the app, repeatable')
+    parser.add_argument('--output', default='-', help='JSON output file, - for stdout')
+    args = parser.parse_args(argv)
+
+    env = dict(item.split('=', 1) for item in args.env)
+    host = FakeVideoHost(args.video_bytes, args.host_rate, args.host_latency, args.hls_segments)
+    host.start()
+    sweep = [None]
+    if args.fragment_concurrency:
+        sweep = [int(n) for n in args.fragment_concurrency.split(',')]
+    run_id = f"{int(time.time())}"
+    results = []
+    try:
+        for fragments in sweep:
+            server_env = dict(env)
+            if fragments is not None:
+                server_env.update({'FRAGMENT_CONCURRENCY_MP4': str(fragments), 'FRAGMENT_CONCURRENCY_MP3': str(fragments)})
+            server = AppServer(args.app, args.workers, args.worker_class, server_env)
+            try:
+                server.start()
+                idle_rss = process_tree_rss(server.process.pid)
+                for scenario in args.scenarios.split(','):
+                    for concurrency in (int(c) for c in args.concurrency.split(',')):
+                        result = run_scenario(
+                            server, host, scenario, concurrency, args.requests, not args.shared, run_id, args.connections
+                        )
+                        result.update({
+                            'scenario': scenario,
+                            'concurrency': concurrency,
+                            'fragmentConcurrency': fragments,
+                            'idleRssBytes': idle_rss,
+                        })
+                        results.append(result)
+                        print(
+                            f"{scenario:>8} c={concurrency:<4} f={fragments} {result['throughputRps']} req/s "
+                            f"p50={result['latencyMs']['p50']}ms p99={result['latencyMs']['p99']}ms "
+                            f"errors={result['errors']}",
+                            file=sys.stderr
+                        )
+            finally:
+                server.stop()
+    finally:
+        host.stop()
+
+    report = {
+        'timestamp': time.time(),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'config': {
+            'app': args.app,
+            'workerClass': args.worker_class,
+            'workers': args.workers,
+            'requests': args.requests,
+            'videoBytes': args.video_bytes,
+            'hostRate': args.host_rate,
+            'hostLatency': args.host_latency,
+            'hlsSegments': args.hls_segments,
+            'connections': args.connections,
+            'shared': args.shared,
+            'env': env,
+        },
+        'hostRequests': host.requests,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+# Gunicorn settings, loaded automatically by `gunicorn app:app`
+import gc
+import os
+
+# Import the app once in the master so yt_dlp and the extractors are shared copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+
+def when_ready(server):
+    """Load the modules workers would otherwise import one by one"""
+    if preload_app:
+        from app import preload_modules
+        preload_modules()
+
+
+def pre_fork(server, worker):
+    """Move everything loaded so far out of the GC's reach so collections don't dirty shared pages"""
+    if preload_app:
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Warm up each worker before it accepts requests, extracting WARMUP_URL in the background"""
+    # Extraction goes over the network and would block the heartbeat past the worker timeout
+    from app import prime_in_background, warm_up
+    warm_up(prime=False)
+    prime_in_background()